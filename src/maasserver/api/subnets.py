@@ -52,7 +52,14 @@ class SubnetsHandler(OperationsHandler):
         known subnets.
         @success-example "success-json" [exkey=subnets-read] placeholder text
         """
-        return Subnet.objects.all()
+        # The VLAN of each subnet is rendered too, so fetch it (and the
+        # related objects it renders) in the same query.
+        return Subnet.objects.all().select_related(
+            "vlan__fabric",
+            "vlan__space",
+            "vlan__primary_rack",
+            "vlan__secondary_rack",
+        )
 
     @admin_method
     def create(self, request):
@@ -13,10 +13,12 @@ from django.conf import settings
 from django.urls import reverse
 from testtools.matchers import Contains, ContainsDict, Equals, HasLength
 
+from maasserver import middleware
 from maasserver.enum import IPADDRESS_TYPE, NODE_STATUS, RDNS_MODE_CHOICES
 from maasserver.testing.api import APITestCase, explain_unexpected_response
 from maasserver.testing.factory import factory, RANDOM
 from maasserver.utils.orm import reload_object
+from maastesting.djangotestcase import count_queries
 from provisioningserver.utils.network import inet_ntop, IPRangeStatistics
 
 
@@ -54,6 +56,25 @@ class TestSubnetsAPI(APITestCase.ForUser):
         ]
         self.assertItemsEqual(expected_ids, result_ids)
 
+    def test_read_query_count_does_not_depend_on_number_of_subnets(self):
+        # Patch middleware so it does not affect query counting.
+        self.patch(
+            middleware.ExternalComponentsMiddleware,
+            "_check_rack_controller_connectivity",
+        )
+        for _ in range(3):
+            factory.make_Subnet()
+        uri = get_subnets_uri()
+        num_queries1, response1 = count_queries(self.client.get, uri)
+        for _ in range(3):
+            factory.make_Subnet()
+        num_queries2, response2 = count_queries(self.client.get, uri)
+        self.assertEqual(
+            [http.client.OK, http.client.OK],
+            [response1.status_code, response2.status_code],
+        )
+        self.assertEqual(num_queries1, num_queries2)
+
     def test_create(self):
         self.become_admin()
         subnet_name = factory.make_name("subnet")
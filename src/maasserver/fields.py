@@ -29,9 +29,15 @@ from django import forms
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.core.validators import RegexValidator, URLValidator
 from django.db import connections
+from django.db.models import (
+    GenericIPAddressField,
+    IntegerField,
+    Lookup,
+    Q,
+    URLField,
+)
 from django.db.models import BinaryField, CharField
 from django.db.models import Field as _BrokenField
-from django.db.models import GenericIPAddressField, IntegerField, Q, URLField
 from django.utils.deconstruct import deconstructible
 from django.utils.encoding import force_text
 from django.utils.translation import ugettext_lazy as _
@@ -550,6 +556,22 @@ class CIDRField(Field):
         return super().formfield(**defaults)
 
 
+@CIDRField.register_lookup
+class NetContains(Lookup):
+    """Matches CIDRs that strictly contain the given address or network.
+
+    Uses PostgreSQL's `>>` operator, so it can be satisfied using a GiST
+    index on the column, e.g. ``cidr__net_contains="192.0.2.1"``.
+    """
+
+    lookup_name = "net_contains"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return "%s >> %s" % (lhs, rhs), lhs_params + rhs_params
+
+
 class IPv4CIDRField(CIDRField):
     """IPv4-only CIDR"""
 
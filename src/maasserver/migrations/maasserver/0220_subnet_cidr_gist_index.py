@@ -0,0 +1,14 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("maasserver", "0219_vm_nic_link")]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX maasserver_subnet__cidr_gist "
+            "ON maasserver_subnet USING gist (cidr inet_ops)",
+            "DROP INDEX maasserver_subnet__cidr_gist",
+        )
+    ]
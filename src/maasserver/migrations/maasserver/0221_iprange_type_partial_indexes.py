@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("maasserver", "0220_subnet_cidr_gist_index")]
+
+    operations = [
+        migrations.RunSQL(
+            "CREATE INDEX maasserver_iprange__subnet_id_reserved "
+            "ON maasserver_iprange (subnet_id) WHERE type = 'reserved'",
+            "DROP INDEX maasserver_iprange__subnet_id_reserved",
+        ),
+        migrations.RunSQL(
+            "CREATE INDEX maasserver_iprange__subnet_id_dynamic "
+            "ON maasserver_iprange (subnet_id) WHERE type = 'dynamic'",
+            "DROP INDEX maasserver_iprange__subnet_id_dynamic",
+        ),
+    ]
@@ -0,0 +1,17 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [("maasserver", "0221_iprange_type_partial_indexes")]
+
+    operations = [
+        # The unique index on ip only covers non-DISCOVERED addresses, and
+        # the (alloc_type, ip) index leads with alloc_type, so neither helps
+        # a lookup by address alone.
+        migrations.RunSQL(
+            "CREATE INDEX maasserver_staticipaddress__ip "
+            "ON maasserver_staticipaddress (ip) WHERE ip IS NOT NULL",
+            "DROP INDEX maasserver_staticipaddress__ip",
+        )
+    ]
@@ -337,7 +337,9 @@ class InterfaceManager(Manager, InterfaceQueriesMixin):
             static_ip_address = StaticIPAddress.objects.get(
                 ip=static_ip_address
             )
-        return self.filter(ip_addresses=static_ip_address)
+        return self.filter(ip_addresses=static_ip_address).select_related(
+            "node", "vlan__fabric"
+        )
 
     def get_all_interfaces_definition_for_node(self, node):
         """Returns the interfaces definition for the specified node.
@@ -1435,20 +1437,24 @@ class Interface(CleanSave, TimestampedModel):
         """Returns all the ancestors of the interface (that is, including each
         parent's parents, and so on.)
         """
-        parents = set(rel.parent for rel in self.parent_relationships.all())
-        parent_relationships = set(self.parent_relationships.all())
-        for parent_rel in parent_relationships:
-            parents |= parent_rel.parent.get_ancestors()
+        # Walk the relationships once; this uses the prefetched relationships
+        # if the caller has prefetched them, and a single query if not.
+        parents = set()
+        for parent_rel in self.parent_relationships.all():
+            parent = parent_rel.parent
+            parents.add(parent)
+            parents |= parent.get_ancestors()
         return parents
 
     def get_successors(self):
         """Returns all the ancestors of the interface (that is, including each
         child's children, and so on.)
         """
-        children = set(rel.child for rel in self.children_relationships.all())
-        children_relationships = set(self.children_relationships.all())
-        for child_rel in children_relationships:
-            children |= child_rel.child.get_successors()
+        children = set()
+        for child_rel in self.children_relationships.all():
+            child = child_rel.child
+            children.add(child)
+            children |= child.get_successors()
         return children
 
     def get_all_related_interfaces(self):
@@ -1668,22 +1674,27 @@ class PhysicalInterface(Interface):
         if len(validation_errors) > 0:
             raise ValidationError(validation_errors)
 
-        # MAC address must be unique amongst every PhysicalInterface.
-        other_interfaces = PhysicalInterface.objects.filter(
-            mac_address=self.mac_address
-        )
-        if self.id is not None:
-            other_interfaces = other_interfaces.exclude(id=self.id)
-        other_interfaces = other_interfaces.all()
-        if len(other_interfaces) > 0:
-            raise ValidationError(
-                {
-                    "mac_address": [
-                        "This MAC address is already in use by %s."
-                        % (other_interfaces[0].get_log_string())
-                    ]
-                }
+        # MAC address must be unique amongst every PhysicalInterface. This
+        # only needs checking when the interface is new or its MAC address
+        # (or type) has changed.
+        if self.id is None or self._state.has_any_changed(
+            ["mac_address", "type"]
+        ):
+            other_interfaces = PhysicalInterface.objects.filter(
+                mac_address=self.mac_address
             )
+            if self.id is not None:
+                other_interfaces = other_interfaces.exclude(id=self.id)
+            other_interface = other_interfaces.first()
+            if other_interface is not None:
+                raise ValidationError(
+                    {
+                        "mac_address": [
+                            "This MAC address is already in use by %s."
+                            % (other_interface.get_log_string())
+                        ]
+                    }
+                )
 
         # No parents are allow for a physical interface.
         if self.id is not None:
@@ -32,6 +32,7 @@ signals = SignalsManager()
 # Amount of time to wait after a node status has been updated to
 # perform a power query.
 WAIT_TO_QUERY = timedelta(seconds=20)
+_WAIT_TO_QUERY_SECS = WAIT_TO_QUERY.total_seconds()
 
 
 @asynchronous(timeout=45)
@@ -67,10 +68,20 @@ def update_power_state_of_node_soon(system_id, clock=reactor):
         use this outside of the reactor thread though!
     """
     return clock.callLater(
-        WAIT_TO_QUERY.total_seconds(), update_power_state_of_node, system_id
+        _WAIT_TO_QUERY_SECS, update_power_state_of_node, system_id
     )
 
 
+def _schedule_update_power_state_of_node(result, system_id):
+    """Post-commit callback that schedules a power query of `system_id`.
+
+    Defined once at module level so saving a node doesn't need to build a
+    new callback chain. `update_power_state_of_node_soon` is looked up at
+    call time so that it can still be patched.
+    """
+    return callOut(result, update_power_state_of_node_soon, system_id)
+
+
 @synchronous
 def signal_update_power_state_of_node(instance, old_values, **kwargs):
     """Updates the power state of a node, when its status changes."""
@@ -78,11 +89,11 @@ def signal_update_power_state_of_node(instance, old_values, **kwargs):
     [old_status] = old_values
 
     # Only check the power state if it's an interesting transition.
-    if old_status in QUERY_TRANSITIONS:
-        if node.status in QUERY_TRANSITIONS[old_status]:
-            post_commit().addCallback(
-                callOut, update_power_state_of_node_soon, node.system_id
-            )
+    transitions = QUERY_TRANSITIONS.get(old_status)
+    if transitions is not None and node.status in transitions:
+        post_commit().addCallback(
+            _schedule_update_power_state_of_node, node.system_id
+        )
 
 
 signals.watch_fields(signal_update_power_state_of_node, Node, ["status"])
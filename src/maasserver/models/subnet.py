@@ -5,7 +5,7 @@
 
 __all__ = ["create_cidr", "get_allocated_ips", "Subnet"]
 
-from operator import attrgetter
+from functools import lru_cache
 from typing import Iterable, Optional
 
 from django.contrib.postgres.fields import ArrayField
@@ -32,7 +32,6 @@ from maasserver.enum import (
     RDNS_MODE_CHOICES,
 )
 from maasserver.exceptions import (
-    MAASAPIException,
     StaticIPAddressExhaustion,
     StaticIPAddressOutOfRange,
     StaticIPAddressUnavailable,
@@ -94,32 +93,41 @@ def create_cidr(network, subnet_mask=None):
     return str(cidr)
 
 
-class SubnetQueriesMixin(MAASQueriesMixin):
+@lru_cache(maxsize=1024)
+def _get_ipv6_reserved_ranges(first, prefixlen):
+    """Return the ranges reserved on an IPv6 network.
 
-    find_subnets_with_ip_query = """
-        SELECT DISTINCT subnet.*, masklen(subnet.cidr) "prefixlen"
-        FROM
-            maasserver_subnet AS subnet
-        WHERE
-            %s << subnet.cidr
-        ORDER BY prefixlen DESC
-        """
+    The ranges only depend on the first address and prefix length of the
+    network, so they are cached.
 
-    def raw_subnets_containing_ip(self, ip):
-        """Find the most specific Subnet the specified IP address belongs in."""
-        return self.raw(self.find_subnets_with_ip_query, params=[str(ip)])
+    :return: a tuple of `MAASIPRange` objects.
+    """
+    ranges = []
+    if prefixlen == 64:
+        ranges.append(
+            make_iprange(
+                str(IPAddress(first + 1)),
+                str(IPAddress(first + 0xFFFFFFFF)),
+                purpose="reserved",
+            )
+        )
+    # Reserve the subnet router anycast address, except for /127 and
+    # /128 networks. (See RFC 6164, and RFC 4291 section 2.6.1.)
+    if prefixlen < 127:
+        first = str(IPAddress(first))
+        ranges.append(make_iprange(first, first, purpose="rfc-4291-2.6.1"))
+    return tuple(ranges)
+
+
+class SubnetQueriesMixin(MAASQueriesMixin):
 
     # Note: << is the postgresql "is contained within" operator.
     # See http://www.postgresql.org/docs/8.4/static/functions-net.html
     # Use an ORDER BY and LIMIT clause to match the most specific
-    # subnet for the given IP address.
-    # Also, when using "SELECT DISTINCT", the items in ORDER BY must be
-    # present in the SELECT. (hence the extra field)
+    # subnet for the given IP address. The containment check can use the
+    # GiST index on maasserver_subnet.cidr.
     find_best_subnet_for_ip_query = """
-        SELECT DISTINCT
-            subnet.*,
-            masklen(subnet.cidr) "prefixlen",
-            vlan.dhcp_on "dhcp_on"
+        SELECT subnet.*
         FROM maasserver_subnet AS subnet
         INNER JOIN maasserver_vlan AS vlan
             ON subnet.vlan_id = vlan.id
@@ -128,10 +136,10 @@ class SubnetQueriesMixin(MAASQueriesMixin):
         ORDER BY
             /* Pick subnet that is on a VLAN that is managed over a subnet
                that is not managed on a VLAN. */
-            dhcp_on DESC,
+            vlan.dhcp_on DESC,
             /* If there are multiple subnets we want to pick the most specific
                one that the IP address falls within. */
-            prefixlen DESC
+            masklen(subnet.cidr) DESC
         LIMIT 1
         """
 
@@ -144,11 +152,8 @@ class SubnetQueriesMixin(MAASQueriesMixin):
         subnets = self.raw(
             self.find_best_subnet_for_ip_query, params=[str(ip)]
         )
-
-        for subnet in subnets:
-            return subnet  # This is stable because the query is ordered.
-        else:
-            return None
+        # The query is ordered and limited to a single row.
+        return next(iter(subnets), None)
 
     def validate_filter_specifiers(self, specifiers):
         """Validate the given filter string."""
@@ -241,14 +246,9 @@ class SubnetQueriesMixin(MAASQueriesMixin):
         return current_q
 
     def _add_ip_in_subnet_query(self, current_q, op, item):
-        # Try to validate this before it hits the database, since this
-        # is going to be a raw query.
+        # Try to validate this before it hits the database.
         item = str(IPAddress(item))
-        # This is a special case. If a specific IP filter is included,
-        # a custom query is needed to get the result. We can't chain
-        # a raw query using Q without grabbing the IDs first.
-        ids = self.get_id_list(self.raw_subnets_containing_ip(item))
-        current_q = op(current_q, Q(id__in=ids))
+        current_q = op(current_q, Q(cidr__net_contains=item))
         return current_q
 
     def _add_subnet_id_query(self, current_q, op, item):
@@ -401,8 +401,17 @@ class Subnet(CleanSave, TimestampedModel):
         """Backward compatibility shim to get the space for this subnet."""
         return self.vlan.space
 
+    # A `(cidr, IPNetwork)` tuple remembered by `get_ipnetwork`.
+    _ipnetwork_cache = None
+
     def get_ipnetwork(self) -> IPNetwork:
-        return IPNetwork(self.cidr)
+        # Parsing the CIDR is comparatively slow and this is called many
+        # times when working out IP address usage, so the network is kept
+        # for as long as the CIDR is unchanged. Callers must not modify it.
+        cache = self._ipnetwork_cache
+        if cache is None or cache[0] != self.cidr:
+            cache = self._ipnetwork_cache = (self.cidr, IPNetwork(self.cidr))
+        return cache[1]
 
     def get_ip_version(self) -> int:
         return self.get_ipnetwork().version
@@ -450,7 +459,12 @@ class Subnet(CleanSave, TimestampedModel):
 
     def delete(self, *args, **kwargs):
         # Check if DHCP is enabled on the VLAN this subnet is attached to.
-        if self.vlan.dhcp_on and self.get_dynamic_ranges().exists():
+        # This is checked in the same query as the dynamic ranges, so the
+        # VLAN doesn't need to be fetched.
+        dynamic_ranges = self.get_dynamic_ranges().filter(
+            subnet__vlan__dhcp_on=True
+        )
+        if dynamic_ranges.exists():
             raise ValidationError(
                 "Cannot delete a subnet that is actively servicing a dynamic "
                 "IP range. (Delete the dynamic range or disable DHCP first.)"
@@ -483,26 +497,54 @@ class Subnet(CleanSave, TimestampedModel):
         """
         self._cached_allocated_ips = ips
 
+    def _iter_allocated_ips(self):
+        """Like get_allocated_ips(), but if the IPs haven't been cached, they
+        are streamed from the database in chunks rather than loaded into a
+        list all at once.
+        """
+        ips = getattr(self, "_cached_allocated_ips", None)
+        if ips is None:
+            ips = (
+                self.staticipaddress_set.filter(ip__isnull=False)
+                .values_list("ip", "alloc_type")
+                .iterator(chunk_size=2000)
+            )
+        return ips
+
     def _get_ranges_for_allocated_ips(
         self, ipnetwork: IPNetwork, ignore_discovered_ips: bool
     ) -> set:
         """Returns a set of MAASIPRange objects created from the set of allocated
         StaticIPAddress objects.
         """
-        ranges = set()
+        # Compare integers against the bounds of the network rather than
+        # using `ip in ipnetwork`, which is comparatively slow when a subnet
+        # has many allocated IPs.
+        first, last, version = (
+            ipnetwork.first,
+            ipnetwork.last,
+            ipnetwork.version,
+        )
+        skipped_types = (
+            {IPADDRESS_TYPE.DISCOVERED} if ignore_discovered_ips else set()
+        )
         # We work with tuple rather than real model objects, since a
         # subnet may many IPs and creating a model object for each IP is
-        # slow.
-        ips = self.get_allocated_ips()
-        for ip, alloc_type in ips:
-            if ip and not (
-                ignore_discovered_ips
-                and (alloc_type == IPADDRESS_TYPE.DISCOVERED)
-            ):
-                ip = IPAddress(ip)
-                if ip in ipnetwork:
-                    ranges.add(make_iprange(ip, purpose="assigned-ip"))
-        return ranges
+        # slow. Duplicate addresses are dropped before they are parsed, and
+        # ranges are only created for the addresses within the network.
+        ips = {
+            IPAddress(ip)
+            for ip in {
+                ip
+                for ip, alloc_type in self._iter_allocated_ips()
+                if ip and alloc_type not in skipped_types
+            }
+        }
+        return {
+            make_iprange(ip, purpose="assigned-ip")
+            for ip in ips
+            if ip.version == version and first <= ip.value <= last
+        }
 
     def get_ipranges_in_use(
         self,
@@ -538,61 +580,56 @@ class Subnet(CleanSave, TimestampedModel):
             # For now, just make sure IPv6 addresses are allocated from
             # *outside* both ranges, so that they won't conflict with addresses
             # reserved from this scheme in the future.
-            first = str(IPAddress(network.first))
-            first_plus_one = str(IPAddress(network.first + 1))
-            second = str(IPAddress(network.first + 0xFFFFFFFF))
-            if network.prefixlen == 64:
-                ranges |= {
-                    make_iprange(first_plus_one, second, purpose="reserved")
-                }
-            # Reserve the subnet router anycast address, except for /127 and
-            # /128 networks. (See RFC 6164, and RFC 4291 section 2.6.1.)
-            if network.prefixlen < 127:
-                ranges |= {
-                    make_iprange(first, first, purpose="rfc-4291-2.6.1")
-                }
+            ranges.update(
+                _get_ipv6_reserved_ranges(network.first, network.prefixlen)
+            )
         if not ranges_only:
             if (
                 self.gateway_ip is not None
                 and self.gateway_ip != ""
                 and self.gateway_ip in network
             ):
-                ranges |= {make_iprange(self.gateway_ip, purpose="gateway-ip")}
+                ranges.add(make_iprange(self.gateway_ip, purpose="gateway-ip"))
             if self.dns_servers is not None:
-                ranges |= set(
+                ranges.update(
                     make_iprange(server, purpose="dns-server")
                     for server in self.dns_servers
                     if server in network
                 )
             if cached_staticroutes is not None:
-                static_routes = [
-                    static_route
+                # Compare the IDs, so that the source of each cached route
+                # doesn't need to be fetched.
+                static_route_gateways = [
+                    static_route.gateway_ip
                     for static_route in cached_staticroutes
-                    if static_route.source == self
+                    if static_route.source_id == self.id
                 ]
             else:
-                static_routes = StaticRoute.objects.filter(source=self)
-            for static_route in static_routes:
-                ranges |= {
-                    make_iprange(static_route.gateway_ip, purpose="gateway-ip")
-                }
-            ranges |= self._get_ranges_for_allocated_ips(
-                network, ignore_discovered_ips
+                static_route_gateways = StaticRoute.objects.filter(
+                    source=self
+                ).values_list("gateway_ip", flat=True)
+            ranges.update(
+                make_iprange(gateway_ip, purpose="gateway-ip")
+                for gateway_ip in static_route_gateways
             )
-            ranges |= set(
+            ranges.update(
+                self._get_ranges_for_allocated_ips(
+                    network, ignore_discovered_ips
+                )
+            )
+            ranges.update(
                 make_iprange(address, purpose="excluded")
                 for address in exclude_addresses
                 if address in network
             )
-        if include_reserved:
-            ranges |= self.get_reserved_maasipset(
-                exclude_ip_ranges=exclude_ip_ranges
-            )
-        ranges |= self.get_dynamic_maasipset(
+        reserved_ranges, dynamic_ranges = self._get_reserved_and_dynamic(
             exclude_ip_ranges=exclude_ip_ranges
         )
+        if include_reserved:
+            ranges.update(reserved_ranges)
+        ranges.update(dynamic_ranges)
         if with_neighbours:
-            ranges |= self.get_maasipset_for_neighbours()
+            ranges.update(self.get_maasipset_for_neighbours())
         return MAASIPSet(ranges)
 
     def get_ipranges_available_for_reserved_range(
@@ -631,14 +668,14 @@ class Subnet(CleanSave, TimestampedModel):
         """
         if exclude_addresses is None:
             exclude_addresses = []
-        in_use = self.get_ipranges_in_use(
-            exclude_addresses=exclude_addresses,
-            ranges_only=ranges_only,
-            with_neighbours=with_neighbours,
-            ignore_discovered_ips=ignore_discovered_ips,
-            exclude_ip_ranges=exclude_ip_ranges,
-        )
         if self.managed or ranges_only:
+            in_use = self.get_ipranges_in_use(
+                exclude_addresses=exclude_addresses,
+                ranges_only=ranges_only,
+                with_neighbours=with_neighbours,
+                ignore_discovered_ips=ignore_discovered_ips,
+                exclude_ip_ranges=exclude_ip_ranges,
+            )
             not_in_use = in_use.get_unused_ranges(self.get_ipnetwork())
         else:
             # The end result we want is a list of unused IP addresses *within*
@@ -677,9 +714,6 @@ class Subnet(CleanSave, TimestampedModel):
             #                               +----+----+----+----+----+----+
             #                   not_in_use: |    |    | n  |    |    |    |
             #                               +----+----+----+----+----+----+
-            unused = in_use.get_unused_ranges(
-                self.get_ipnetwork(), purpose=MAASIPRANGE_TYPE.UNMANAGED
-            )
             unmanaged_in_use = self.get_ipranges_in_use(
                 exclude_addresses=exclude_addresses,
                 ranges_only=ranges_only,
@@ -688,6 +722,19 @@ class Subnet(CleanSave, TimestampedModel):
                 ignore_discovered_ips=ignore_discovered_ips,
                 exclude_ip_ranges=exclude_ip_ranges,
             )
+            # The full set of in-use addresses is the same, plus the reserved
+            # ranges. Only the addresses it covers matter here (not their
+            # purposes), so build it from the set above rather than querying
+            # for everything a second time.
+            in_use = MAASIPSet(
+                unmanaged_in_use.ranges
+                + self.get_reserved_maasipset(
+                    exclude_ip_ranges=exclude_ip_ranges
+                ).ranges
+            )
+            unused = in_use.get_unused_ranges(
+                self.get_ipnetwork(), purpose=MAASIPRANGE_TYPE.UNMANAGED
+            )
             unmanaged_in_use |= unused
             not_in_use = unmanaged_in_use.get_unused_ranges(
                 self.get_ipnetwork(), purpose=MAASIPRANGE_TYPE.UNUSED
@@ -811,7 +858,7 @@ class Subnet(CleanSave, TimestampedModel):
         # can be preserved in case they need to be used for applications
         # requiring them. If two ranges have the same number of IPs, choose the
         # lowest one.
-        free_range = min(free_ranges, key=attrgetter("num_addresses", "first"))
+        free_range = free_ranges.get_smallest_unused_block()
         return str(IPAddress(free_range.first))
 
     def render_json_for_related_ips(
@@ -833,16 +880,18 @@ class Subnet(CleanSave, TimestampedModel):
                 "dnsresource_set",
                 "dnsresource_set__domain",
             )
-        return sorted(
-            [
-                ip.render_json(
-                    with_username=with_username, with_summary=with_summary
-                )
-                for ip in ip_addresses
-                if ip.ip
-            ],
-            key=lambda json: IPAddress(json["ip"]),
+        # Sort on netaddr's sort key (a tuple of integers) so that the
+        # comparisons don't go through IPAddress.__lt__.
+        ip_addresses = sorted(
+            (ip for ip in ip_addresses if ip.ip),
+            key=lambda ip: IPAddress(ip.ip).sort_key(),
         )
+        return [
+            ip.render_json(
+                with_username=with_username, with_summary=with_summary
+            )
+            for ip in ip_addresses
+        ]
 
     def get_dynamic_ranges(self):
         return self.iprange_set.filter(type=IPRANGE_TYPE.DYNAMIC)
@@ -850,7 +899,7 @@ class Subnet(CleanSave, TimestampedModel):
     def get_reserved_ranges(self):
         return self.iprange_set.filter(type=IPRANGE_TYPE.RESERVED)
 
-    def is_valid_static_ip(self, *args, **kwargs):
+    def is_valid_static_ip(self, ip):
         """Validates that the requested IP address is acceptable for allocation
         in this `Subnet` (assuming it has not already been allocated).
 
@@ -861,11 +910,7 @@ class Subnet(CleanSave, TimestampedModel):
 
         :return: bool
         """
-        try:
-            self.validate_static_ip(*args, **kwargs)
-        except MAASAPIException:
-            return False
-        return True
+        return self._check_static_ip(ip) is None
 
     def validate_static_ip(self, ip):
         """Validates that the requested IP address is acceptable for allocation
@@ -879,22 +924,47 @@ class Subnet(CleanSave, TimestampedModel):
         :raises StaticIPAddressUnavailable: If the IP address specified is not
             available for allocation.
         """
-        if ip not in self.get_ipnetwork():
-            raise StaticIPAddressOutOfRange(
+        error = self._check_static_ip(ip)
+        if error is not None:
+            raise error
+
+    def _check_static_ip(self, ip):
+        """Checks whether the IP address is acceptable for allocation.
+
+        :return: the exception `validate_static_ip` should raise, or `None`
+            if the address is acceptable.
+        """
+        # Parse the address at most once (callers such as
+        # `StaticIPAddressManager.allocate_new` already pass an `IPAddress`),
+        # and compare it against the bounds of the network as integers.
+        network = self.get_ipnetwork()
+        ip_addr = ip if isinstance(ip, IPAddress) else IPAddress(ip)
+        if not (
+            ip_addr.version == network.version
+            and network.first <= ip_addr.value <= network.last
+        ):
+            return StaticIPAddressOutOfRange(
                 "%s is not within subnet CIDR: %s" % (ip, self.cidr)
             )
-        for iprange in self.get_reserved_maasipset():
-            if ip in iprange:
-                raise StaticIPAddressUnavailable(
-                    "%s is within the reserved range from %s to %s"
-                    % (ip, IPAddress(iprange.first), IPAddress(iprange.last))
-                )
-        for iprange in self.get_dynamic_maasipset():
-            if ip in iprange:
-                raise StaticIPAddressUnavailable(
-                    "%s is within the dynamic range from %s to %s"
-                    % (ip, IPAddress(iprange.first), IPAddress(iprange.last))
+        # Let PostgreSQL compare the address with the bounds of each range
+        # (as `inet` values), so only the ranges containing it are fetched,
+        # and only the columns needed to report them.
+        ipranges = {
+            iprange.type: iprange
+            for iprange in self.iprange_set.filter(
+                type__in=(IPRANGE_TYPE.RESERVED, IPRANGE_TYPE.DYNAMIC),
+                start_ip__lte=str(ip_addr),
+                end_ip__gte=str(ip_addr),
+            ).only("type", "start_ip", "end_ip")
+        }
+        for iprange_type in (IPRANGE_TYPE.RESERVED, IPRANGE_TYPE.DYNAMIC):
+            iprange = ipranges.get(iprange_type)
+            if iprange is not None:
+                return StaticIPAddressUnavailable(
+                    "%s is within the %s range from %s to %s"
+                    % (ip, iprange_type, iprange.start_ip, iprange.end_ip)
                 )
+        return None
 
     def get_reserved_maasipset(self, exclude_ip_ranges: list = None):
         if exclude_ip_ranges is None:
@@ -918,19 +988,37 @@ class Subnet(CleanSave, TimestampedModel):
         )
         return dynamic_ranges
 
+    def _get_reserved_and_dynamic(self, exclude_ip_ranges: list = None):
+        """Returns the reserved and dynamic `MAASIPSet`s for this subnet.
+
+        This is equivalent to calling `get_reserved_maasipset()` and
+        `get_dynamic_maasipset()`, but the IP ranges are only fetched once.
+        """
+        if exclude_ip_ranges is None:
+            exclude_ip_ranges = []
+        reserved_ranges = []
+        dynamic_ranges = []
+        for iprange in self.iprange_set.all():
+            if iprange in exclude_ip_ranges:
+                continue
+            if iprange.type == IPRANGE_TYPE.RESERVED:
+                reserved_ranges.append(iprange.get_MAASIPRange())
+            elif iprange.type == IPRANGE_TYPE.DYNAMIC:
+                dynamic_ranges.append(iprange.get_MAASIPRange())
+        return MAASIPSet(reserved_ranges), MAASIPSet(dynamic_ranges)
+
     def get_dynamic_range_for_ip(self, ip):
         """Return `IPRange` for the provided `ip`."""
-        # XXX mpontillo 2016-01-21: for some reason this query doesn't work.
-        # I tried it both like this, and with:
-        #     start_ip__gte=ip, and end_ip__lte=ip
-        # return get_one(self.get_dynamic_ranges().extra(
-        #        where=["start_ip >= inet '%s'" % ip,
-        # ... which sounds a lot like comment 15 in:
-        #     https://code.djangoproject.com/ticket/11442
-        for iprange in self.get_dynamic_ranges():
-            if ip in iprange.netaddr_iprange:
-                return iprange
-        return None
+        # The bounds are compared as `inet` values by PostgreSQL, so only
+        # the range containing the address (if any) is fetched.
+        if not isinstance(ip, IPAddress):
+            ip = IPAddress(ip)
+        ip = str(ip)
+        return (
+            self.get_dynamic_ranges()
+            .filter(start_ip__lte=ip, end_ip__gte=ip)
+            .first()
+        )
 
     def get_smallest_enclosing_sane_subnet(self):
         """Return the subnet that includes this subnet.
@@ -940,19 +1028,25 @@ class Subnet(CleanSave, TimestampedModel):
 
         If no such subnet exists, return None.
         """
+        # Only subnets of the same family can contain this one, so the
+        # maximum prefix length is chosen here rather than in the query. The
+        # containment check can use the GiST index on cidr.
+        if self.get_ipnetwork().version == 4:
+            max_prefixlen = 24
+        else:
+            max_prefixlen = 124
         find_rfc2137_parent_query = """
             SELECT * FROM maasserver_subnet
             WHERE
-                %s << cidr AND (
-                    (family(cidr) = 6 and masklen(cidr) <= 124) OR
-                    (family(cidr) = 4 and masklen(cidr) <= 24))
+                cidr >> %s::cidr AND masklen(cidr) <= %s
             ORDER BY
                 masklen(cidr) DESC
             LIMIT 1
             """
-        for s in Subnet.objects.raw(find_rfc2137_parent_query, (self.cidr,)):
-            return s
-        return None
+        subnets = Subnet.objects.raw(
+            find_rfc2137_parent_query, (self.cidr, max_prefixlen)
+        )
+        return next(iter(subnets), None)
 
     def update_allocation_notification(self):
         # Workaround for edge cases in Django. (See bug #1702527.)
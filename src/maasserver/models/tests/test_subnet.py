@@ -31,9 +31,19 @@ from maasserver.enum import (
     RDNS_MODE,
     RDNS_MODE_CHOICES,
 )
-from maasserver.exceptions import StaticIPAddressExhaustion
+from maasserver.exceptions import (
+    StaticIPAddressExhaustion,
+    StaticIPAddressOutOfRange,
+    StaticIPAddressUnavailable,
+)
 from maasserver.models import Config, Notification, Space
-from maasserver.models.subnet import create_cidr, get_allocated_ips, Subnet
+from maasserver.models.staticroute import StaticRoute
+from maasserver.models.subnet import (
+    _get_ipv6_reserved_ranges,
+    create_cidr,
+    get_allocated_ips,
+    Subnet,
+)
 from maasserver.models.timestampedmodel import now
 from maasserver.permissions import NodePermission
 from maasserver.testing.factory import factory, RANDOM, RANDOM_OR_NONE
@@ -41,8 +51,8 @@ from maasserver.testing.orm import rollback
 from maasserver.testing.testcase import MAASServerTestCase
 from maasserver.utils.orm import get_one, reload_object
 from maastesting.djangotestcase import count_queries, CountQueries
-from maastesting.matchers import DocTestMatches
-from provisioningserver.utils.network import inet_ntop, MAASIPRange
+from maastesting.matchers import DocTestMatches, MockCalledOnce
+from provisioningserver.utils.network import inet_ntop, MAASIPRange, MAASIPSet
 
 
 class TestSubnet(MAASServerTestCase):
@@ -251,6 +261,28 @@ class TestSubnetQueriesMixin(MAASServerTestCase):
             Subnet.objects.filter_by_specifiers("ip:1.1.1.1"), []
         )
 
+    def test_filter_by_specifiers_ip_filter_uses_single_query(self):
+        subnet = factory.make_Subnet(cidr="8.8.8.0/24")
+        count, subnets = count_queries(
+            lambda: list(Subnet.objects.filter_by_specifiers("ip:8.8.8.8"))
+        )
+        self.assertEqual([subnet], subnets)
+        self.assertEqual(1, count)
+
+    def test_filter_by_specifiers_multiple_ip_filters_use_single_query(self):
+        subnet1 = factory.make_Subnet(cidr="8.8.8.0/24")
+        subnet2 = factory.make_Subnet(cidr="2001:db8::/64")
+        factory.make_Subnet(cidr="10.0.0.0/24")
+        count, subnets = count_queries(
+            lambda: list(
+                Subnet.objects.filter_by_specifiers(
+                    ["ip:8.8.8.8", "ip:2001:db8::1", "ip:192.0.2.1"]
+                )
+            )
+        )
+        self.assertItemsEqual([subnet1, subnet2], subnets)
+        self.assertEqual(1, count)
+
     def test_filter_by_specifiers_ip_filter_raises_for_invalid_ip(self):
         factory.make_Subnet(name="subnet1", cidr="8.8.8.0/24")
         factory.make_Subnet(name="subnet2", cidr="2001:db8::/64")
@@ -514,14 +546,19 @@ class TestSubnetManagerGetSubnetOr404(MAASServerTestCase):
 
 
 class SubnetTest(MAASServerTestCase):
-    def assertIPBestMatchesSubnet(self, ip, expected):
-        subnets = Subnet.objects.raw_subnets_containing_ip(IPAddress(ip))
-        for tmp in subnets:
-            subnet = tmp
-            break
-        else:
-            subnet = None
-        self.assertThat(subnet, Equals(expected))
+    def test_get_ipnetwork_returns_network_for_cidr(self):
+        subnet = factory.make_Subnet(cidr="10.0.0.0/24")
+        self.assertEqual(IPNetwork("10.0.0.0/24"), subnet.get_ipnetwork())
+
+    def test_get_ipnetwork_is_cached(self):
+        subnet = factory.make_Subnet()
+        self.assertIs(subnet.get_ipnetwork(), subnet.get_ipnetwork())
+
+    def test_get_ipnetwork_follows_cidr_changes(self):
+        subnet = factory.make_Subnet(cidr="10.0.0.0/24")
+        subnet.get_ipnetwork()
+        subnet.cidr = "10.0.1.0/24"
+        self.assertEqual(IPNetwork("10.0.1.0/24"), subnet.get_ipnetwork())
 
     def test_creates_subnet(self):
         name = factory.make_name("name")
@@ -711,40 +748,6 @@ class SubnetTest(MAASServerTestCase):
             ),
         )
 
-    def test_get_subnets_with_ip_finds_matching_subnet(self):
-        subnet = factory.make_Subnet(cidr=factory.make_ipv4_network())
-        self.assertIPBestMatchesSubnet(subnet.get_ipnetwork().first, subnet)
-        self.assertIPBestMatchesSubnet(subnet.get_ipnetwork().last, subnet)
-
-    def test_get_subnets_with_ip_finds_most_specific_subnet(self):
-        subnet1 = factory.make_Subnet(cidr=IPNetwork("10.0.0.0/8"))
-        subnet2 = factory.make_Subnet(cidr=IPNetwork("10.0.0.0/16"))
-        subnet3 = factory.make_Subnet(cidr=IPNetwork("10.0.0.0/24"))
-        self.assertIPBestMatchesSubnet(subnet1.get_ipnetwork().first, subnet3)
-        self.assertIPBestMatchesSubnet(subnet1.get_ipnetwork().last, subnet1)
-        self.assertIPBestMatchesSubnet(subnet2.get_ipnetwork().last, subnet2)
-        self.assertIPBestMatchesSubnet(subnet3.get_ipnetwork().last, subnet3)
-
-    def test_get_subnets_with_ip_finds_matching_ipv6_subnet(self):
-        subnet = factory.make_Subnet(cidr=factory.make_ipv6_network())
-        self.assertIPBestMatchesSubnet(subnet.get_ipnetwork().first, subnet)
-        self.assertIPBestMatchesSubnet(subnet.get_ipnetwork().last, subnet)
-
-    def test_get_subnets_with_ip_finds_most_specific_ipv6_subnet(self):
-        subnet1 = factory.make_Subnet(cidr=IPNetwork("2001:db8::/32"))
-        subnet2 = factory.make_Subnet(cidr=IPNetwork("2001:db8::/48"))
-        subnet3 = factory.make_Subnet(cidr=IPNetwork("2001:db8::/64"))
-        self.assertIPBestMatchesSubnet(subnet1.get_ipnetwork().first, subnet3)
-        self.assertIPBestMatchesSubnet(subnet1.get_ipnetwork().last, subnet1)
-        self.assertIPBestMatchesSubnet(subnet2.get_ipnetwork().last, subnet2)
-        self.assertIPBestMatchesSubnet(subnet3.get_ipnetwork().last, subnet3)
-
-    def test_get_subnets_with_ip_returns_empty_list_if_not_found(self):
-        network = factory._make_random_network()
-        factory.make_Subnet()
-        self.assertIPBestMatchesSubnet(network.first - 1, None)
-        self.assertIPBestMatchesSubnet(network.first + 1, None)
-
     def make_random_parent(self, net, bits=None):
         if bits is None:
             bits = random.randint(1, 3)
@@ -761,6 +764,14 @@ class SubnetTest(MAASServerTestCase):
         subnet = factory.make_Subnet()
         self.assertEqual(None, subnet.get_smallest_enclosing_sane_subnet())
 
+    def test_get_smallest_enclosing_sane_subnet_ignores_small_parents(self):
+        subnet = factory.make_Subnet(cidr="10.0.0.0/26")
+        factory.make_Subnet(cidr="10.0.0.0/25")
+        self.assertEqual(None, subnet.get_smallest_enclosing_sane_subnet())
+        parent = factory.make_Subnet(cidr="10.0.0.0/24")
+        factory.make_Subnet(cidr="10.0.0.0/16")
+        self.assertEqual(parent, subnet.get_smallest_enclosing_sane_subnet())
+
     @settings(deadline=None)
     @given(integers(25, 29), integers(2, 5))
     def test_get_smallest_enclosing_sane_subnet_finds_parent_ipv4(
@@ -796,6 +807,11 @@ class SubnetTest(MAASServerTestCase):
         with ExpectedException(ValidationError, ".*servicing a dynamic.*"):
             subnet.delete()
 
+    def test_can_delete_with_dynamic_range_if_dhcp_disabled(self):
+        subnet = factory.make_ipv4_Subnet_with_IPRanges(unmanaged=True)
+        subnet.delete()
+        self.assertIsNone(reload_object(subnet))
+
 
 class TestGetBestSubnetForIP(MAASServerTestCase):
     def test_returns_most_specific_ipv4_subnet(self):
@@ -894,6 +910,57 @@ class SubnetIPRangeTest(MAASServerTestCase):
         self.assertThat(s, Not(Contains(static_range_low)))
         self.assertThat(s, Not(Contains(static_range_high)))
 
+    def test_finds_used_ranges_ignores_allocated_ip_outside_network(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip="", dns_servers=[]
+        )
+        subnet.cache_allocated_ips(
+            [
+                ("10.0.0.50", IPADDRESS_TYPE.USER_RESERVED),
+                ("10.0.1.50", IPADDRESS_TYPE.USER_RESERVED),
+                ("::ffff:10.0.0.60", IPADDRESS_TYPE.USER_RESERVED),
+            ]
+        )
+        s = subnet.get_ipranges_in_use()
+        self.assertThat(s, Contains("10.0.0.50"))
+        self.assertThat(s, Not(Contains("10.0.1.50")))
+        self.assertThat(s, Not(Contains("10.0.0.60")))
+
+    def test_finds_used_ranges_includes_ipv6_reserved_ranges(self):
+        subnet = factory.make_Subnet(
+            cidr="2001:db8::/64", gateway_ip="", dns_servers=[]
+        )
+        s = subnet.get_ipranges_in_use()
+        self.assertThat(s, Contains("2001:db8::"))
+        self.assertThat(s, Contains("2001:db8::1"))
+        self.assertThat(s, Contains("2001:db8::ffff:ffff"))
+        self.assertThat(s, Not(Contains("2001:db8::1:0:0")))
+
+    def test_finds_used_ranges_caches_ipv6_reserved_ranges(self):
+        subnet = factory.make_Subnet(
+            cidr="2001:db8::/64", gateway_ip="", dns_servers=[]
+        )
+        _get_ipv6_reserved_ranges.cache_clear()
+        self.addCleanup(_get_ipv6_reserved_ranges.cache_clear)
+        subnet.get_ipranges_in_use()
+        subnet.get_ipranges_in_use()
+        self.assertEqual(1, _get_ipv6_reserved_ranges.cache_info().hits)
+
+    def test_finds_used_ranges_ignores_duplicate_allocated_ips(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip="", dns_servers=[]
+        )
+        subnet.cache_allocated_ips(
+            [
+                ("10.0.0.50", IPADDRESS_TYPE.USER_RESERVED),
+                ("10.0.0.50", IPADDRESS_TYPE.DISCOVERED),
+                ("10.0.0.60", IPADDRESS_TYPE.DISCOVERED),
+            ]
+        )
+        s = subnet.get_ipranges_in_use(ignore_discovered_ips=True)
+        self.assertEqual(1, s.find("10.0.0.50").num_addresses)
+        self.assertThat(s, Not(Contains("10.0.0.60")))
+
     def test_get_ipranges_not_in_use_includes_free_ips(self):
         subnet = factory.make_Subnet(
             gateway_ip="", dns_servers=[], host_bits=8
@@ -983,6 +1050,25 @@ class SubnetIPRangeTest(MAASServerTestCase):
         self.assertThat(s, Contains(gateway_ip_1))
         self.assertThat(s, Contains(gateway_ip_2))
 
+    def test_get_iprange_usage_uses_cached_static_routes(self):
+        subnet = factory.make_Subnet(
+            gateway_ip="", dns_servers=[], host_bits=8
+        )
+        other_subnet = factory.make_Subnet()
+        gateway_ip = factory.pick_ip_in_Subnet(subnet)
+        factory.make_StaticRoute(source=subnet, gateway_ip=gateway_ip)
+        factory.make_StaticRoute(source=other_subnet)
+        subnet.cache_allocated_ips([])
+        static_routes = list(StaticRoute.objects.all())
+        count_without_routes, _ = count_queries(
+            subnet.get_iprange_usage, cached_staticroutes=[]
+        )
+        count, s = count_queries(
+            subnet.get_iprange_usage, cached_staticroutes=static_routes
+        )
+        self.assertThat(s, Contains(gateway_ip))
+        self.assertEqual(count_without_routes, count)
+
     def get__get_iprange_usage_includes_neighbours_on_request(self):
         subnet = factory.make_Subnet(
             cidr="10.0.0.0/30", gateway_ip=None, dns_servers=None
@@ -1230,6 +1316,30 @@ class TestSubnetGetRelatedRanges(MAASServerTestCase):
             subnet.get_dynamic_range_for_ip(random_ip), Equals(dynamic_range)
         )
 
+    def test_get_dynamic_range_for_ip_ignores_other_ranges(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=None
+        )
+        factory.make_IPRange(
+            subnet,
+            start_ip="10.0.0.10",
+            end_ip="10.0.0.19",
+            alloc_type=IPRANGE_TYPE.RESERVED,
+        )
+        dynamic_range = factory.make_IPRange(
+            subnet,
+            start_ip="10.0.0.20",
+            end_ip="10.0.0.29",
+            alloc_type=IPRANGE_TYPE.DYNAMIC,
+        )
+        self.assertThat(subnet.get_dynamic_range_for_ip("10.0.0.15"), Is(None))
+        self.assertThat(subnet.get_dynamic_range_for_ip("10.0.0.30"), Is(None))
+        self.assertThat(subnet.get_dynamic_range_for_ip("::1"), Is(None))
+        self.assertThat(
+            subnet.get_dynamic_range_for_ip(IPAddress("10.0.0.25")),
+            Equals(dynamic_range),
+        )
+
 
 class TestSubnetGetMAASIPSetForNeighbours(MAASServerTestCase):
     def test_returns_observed_neighbours(self):
@@ -1499,6 +1609,30 @@ class TestUnmanagedSubnets(MAASServerTestCase):
         ):
             subnet.get_next_ip_for_allocation()
 
+    def test_get_ipranges_not_in_use_gets_in_use_ranges_once(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/29",
+            gateway_ip=None,
+            dns_servers=None,
+            managed=False,
+        )
+        factory.make_IPRange(
+            subnet,
+            start_ip="10.0.0.3",
+            end_ip="10.0.0.4",
+            alloc_type=IPRANGE_TYPE.RESERVED,
+        )
+        subnet = reload_object(subnet)
+        get_ipranges_in_use = self.patch_autospec(
+            subnet, "get_ipranges_in_use"
+        )
+        get_ipranges_in_use.side_effect = lambda **kwargs: MAASIPSet([])
+        s = subnet.get_ipranges_not_in_use()
+        self.assertThat(get_ipranges_in_use, MockCalledOnce())
+        self.assertThat(s, Contains("10.0.0.3"))
+        self.assertThat(s, Contains("10.0.0.4"))
+        self.assertThat(s, Not(Contains("10.0.0.2")))
+
 
 class TestSubnetIPExhaustionNotifications(MAASServerTestCase):
     """Tests the effects of the signal handlers on the StaticIPAddress and
@@ -1856,3 +1990,115 @@ class TestGetAllocatedIps(MAASServerTestCase):
             [(ip1.ip, ip1.alloc_type), (ip2.ip, ip2.alloc_type)], ips
         )
         self.assertEqual(0, queries)
+
+    def test_subnet_iter_allocated_ips(self):
+        subnet = factory.make_Subnet()
+        ip1 = factory.make_StaticIPAddress(subnet=subnet)
+        ip2 = factory.make_StaticIPAddress(subnet=subnet)
+        factory.make_StaticIPAddress(subnet=subnet, ip="")
+        self.assertItemsEqual(
+            [(ip1.ip, ip1.alloc_type), (ip2.ip, ip2.alloc_type)],
+            subnet._iter_allocated_ips(),
+        )
+
+    def test_subnet_iter_allocated_ips_cached(self):
+        subnet = factory.make_Subnet()
+        ips = [("10.0.0.1", IPADDRESS_TYPE.AUTO)]
+        subnet.cache_allocated_ips(ips)
+        queries, result = count_queries(subnet._iter_allocated_ips)
+        self.assertIs(ips, result)
+        self.assertEqual(0, queries)
+
+
+class TestSubnetValidateStaticIP(MAASServerTestCase):
+    def make_subnet_with_ranges(self):
+        subnet = factory.make_Subnet(
+            cidr="10.0.0.0/24", gateway_ip=None, dns_servers=None
+        )
+        factory.make_IPRange(
+            subnet,
+            start_ip="10.0.0.10",
+            end_ip="10.0.0.19",
+            alloc_type=IPRANGE_TYPE.RESERVED,
+        )
+        factory.make_IPRange(
+            subnet,
+            start_ip="10.0.0.20",
+            end_ip="10.0.0.29",
+            alloc_type=IPRANGE_TYPE.DYNAMIC,
+        )
+        return reload_object(subnet)
+
+    def test_accepts_ip_outside_ranges(self):
+        subnet = self.make_subnet_with_ranges()
+        subnet.validate_static_ip("10.0.0.9")
+        subnet.validate_static_ip("10.0.0.30")
+
+    def test_rejects_ip_outside_network(self):
+        subnet = self.make_subnet_with_ranges()
+        self.assertRaises(
+            StaticIPAddressOutOfRange, subnet.validate_static_ip, "10.0.1.1"
+        )
+
+    def test_rejects_ip_of_other_family(self):
+        subnet = self.make_subnet_with_ranges()
+        self.assertRaises(
+            StaticIPAddressOutOfRange,
+            subnet.validate_static_ip,
+            "::ffff:10.0.0.30",
+        )
+
+    def test_accepts_ipaddress(self):
+        subnet = self.make_subnet_with_ranges()
+        subnet.validate_static_ip(IPAddress("10.0.0.30"))
+
+    def test_rejects_ip_in_reserved_range(self):
+        subnet = self.make_subnet_with_ranges()
+        with ExpectedException(
+            StaticIPAddressUnavailable,
+            "10.0.0.15 is within the reserved range from "
+            "10.0.0.10 to 10.0.0.19",
+        ):
+            subnet.validate_static_ip("10.0.0.15")
+
+    def test_rejects_ip_in_dynamic_range(self):
+        subnet = self.make_subnet_with_ranges()
+        with ExpectedException(
+            StaticIPAddressUnavailable,
+            "10.0.0.25 is within the dynamic range from "
+            "10.0.0.20 to 10.0.0.29",
+        ):
+            subnet.validate_static_ip("10.0.0.25")
+
+    def test_reports_bounds_of_containing_range(self):
+        subnet = self.make_subnet_with_ranges()
+        factory.make_IPRange(
+            subnet,
+            start_ip="10.0.0.30",
+            end_ip="10.0.0.39",
+            alloc_type=IPRANGE_TYPE.RESERVED,
+        )
+        factory.make_IPRange(
+            subnet,
+            start_ip="10.0.0.40",
+            end_ip="10.0.0.49",
+            alloc_type=IPRANGE_TYPE.RESERVED,
+        )
+        with ExpectedException(
+            StaticIPAddressUnavailable,
+            "10.0.0.45 is within the reserved range from "
+            "10.0.0.40 to 10.0.0.49",
+        ):
+            subnet.validate_static_ip("10.0.0.45")
+
+    def test_fetches_ip_ranges_once(self):
+        subnet = self.make_subnet_with_ranges()
+        count, _ = count_queries(subnet.validate_static_ip, "10.0.0.30")
+        self.assertEqual(1, count)
+
+    def test_is_valid_static_ip(self):
+        subnet = self.make_subnet_with_ranges()
+        self.assertTrue(subnet.is_valid_static_ip("10.0.0.30"))
+        self.assertFalse(subnet.is_valid_static_ip("10.0.0.15"))
+        self.assertFalse(subnet.is_valid_static_ip("10.0.0.25"))
+        self.assertFalse(subnet.is_valid_static_ip("10.0.1.1"))
@@ -5,16 +5,56 @@
 
 __all__ = ["getClientFromIdentifiers", "getClientFor", "getAllClients"]
 
+import random
+
+from twisted.internet import reactor
+
 from maasserver import eventloop
 from provisioningserver.rpc import exceptions
 from provisioningserver.utils.twisted import asynchronous, deferred, FOREVER
 
+# Number of seconds for which the clients found by `getClientFromIdentifiers`
+# are remembered. Polling many nodes that share the same rack controllers
+# then only walks the connection table once per sweep.
+CLIENT_CACHE_TTL = 0.5
+
+# Maps a sorted tuple of identifiers to a `(service, expires, clients)` tuple.
+_client_cache = {}
+
+
+def _discardCachedClients(ident):
+    """Forget cached clients that could have been resolved via `ident`.
+
+    Registered as a handler for the RPC service's `disconnected` event.
+    """
+    for key in [key for key in _client_cache if ident in key]:
+        del _client_cache[key]
+
+
+def _cacheClients(client, service, key, clock=reactor):
+    """Remember clients for every connection to `key`.
+
+    They are remembered for `CLIENT_CACHE_TTL` seconds. `client` is passed
+    through.
+    """
+    clients = service.getAllClientsFromIdentifiers(key)
+    if len(clients) > 0:
+        service.events.disconnected.registerHandler(_discardCachedClients)
+        expires = clock.seconds() + CLIENT_CACHE_TTL
+        _client_cache[key] = (service, expires, clients)
+    return client
+
 
 @asynchronous(timeout=FOREVER)  # Handles times-out itself.
 @deferred  # Always return a Deferred, no matter what.
-def getClientFromIdentifiers(identifiers, timeout=0):
+def getClientFromIdentifiers(identifiers, timeout=0, clock=reactor):
     """Get a client with which to make RPCs to any one of the `identifiers`.
 
+    The clients for every connection to the `identifiers` are cached for
+    `CLIENT_CACHE_TTL` seconds, or until one of the rack controllers
+    disconnects, whichever comes first. One of them is still chosen at
+    random for each call, so that RPCs are spread across the connections.
+
     :param timeout: The number of seconds to wait before giving up on
         getting a connection. By default, `timeout` is 0.
     :raises: :py:class:`~.exceptions.NoConnectionsAvailable` when there
@@ -28,7 +68,15 @@ def getClientFromIdentifiers(identifiers, timeout=0):
             "available." % ",".join(identifiers)
         )
     else:
-        return service.getClientFromIdentifiers(identifiers, timeout=timeout)
+        key = tuple(sorted(identifiers))
+        cached = _client_cache.get(key)
+        if cached is not None:
+            cached_service, expires, clients = cached
+            if cached_service is service and expires > clock.seconds():
+                return random.choice(clients)
+            del _client_cache[key]
+        d = service.getClientFromIdentifiers(identifiers, timeout=timeout)
+        return d.addCallback(_cacheClients, service, key, clock)
 
 
 @asynchronous(timeout=FOREVER)  # Handles times-out itself.
@@ -6,6 +6,7 @@
 __all__ = [
     "mark_node_failed",
     "update_node_power_state",
+    "update_node_power_states",
     "commission_node",
     "create_node",
 ]
@@ -16,6 +17,7 @@ import json
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.db.models import F, Q
+from twisted.python.failure import Failure
 
 from maasserver import exceptions, ntp
 from maasserver.api.utils import get_overridden_query_dict
@@ -166,6 +168,67 @@ def update_node_power_state(system_id, power_state):
     node.update_power_state(power_state)
 
 
+@transactional
+def _update_unchanged_power_states(power_states):
+    """Bump `power_state_updated` for nodes whose power state is unchanged.
+
+    This is done for all of them with a single UPDATE.
+
+    :return: A tuple of the system_ids of the nodes that were unchanged and
+        the system_ids of the nodes that need `Node.update_power_state`.
+    """
+    unchanged, changed = [], []
+    nodes = Node.objects.filter(system_id__in=power_states)
+    for system_id, power_state, status in nodes.values_list(
+        "system_id", "power_state", "status"
+    ):
+        if power_state == power_states[system_id] and status not in (
+            NODE_STATUS.RELEASING,
+            NODE_STATUS.EXITING_RESCUE_MODE,
+        ):
+            unchanged.append(system_id)
+        else:
+            changed.append(system_id)
+    if unchanged:
+        Node.objects.filter(system_id__in=unchanged).update(
+            power_state_updated=now()
+        )
+    return unchanged, changed
+
+
+@synchronous
+def update_node_power_states(power_states):
+    """Update the power states of several nodes at once.
+
+    Nodes whose power state is unchanged, which is the common case when
+    polling, only need `power_state_updated` bumping; that is done for all
+    of them in one transaction. Nodes whose power state has changed, or
+    that are waiting on their power state to change status, go through
+    `Node.update_power_state` so that its side-effects and signals still
+    apply. Each of those is updated in its own transaction so that a failure
+    for one node does not prevent the others from being updated.
+
+    :param power_states: A dict mapping system_ids to power states. Nodes
+        that do not exist are ignored.
+    :return: A tuple of the system_ids of the nodes that were updated and a
+        dict mapping the system_ids of the nodes that could not be updated
+        to a `Failure`.
+    """
+    updated, changed = _update_unchanged_power_states(power_states)
+    failures = {}
+    for system_id in changed:
+        try:
+            update_node_power_state(system_id, power_states[system_id])
+        except NoSuchNode:
+            # The node was deleted since its power state was read.
+            pass
+        except Exception:
+            failures[system_id] = Failure()
+        else:
+            updated.append(system_id)
+    return updated, failures
+
+
 @synchronous
 @transactional
 def create_node(
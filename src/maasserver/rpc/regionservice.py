@@ -8,6 +8,7 @@ __all__ = ["RegionService"]
 from collections import defaultdict
 import copy
 from datetime import datetime
+from functools import partial
 from os import urandom
 import random
 from socket import AF_INET, AF_INET6
@@ -19,6 +20,7 @@ from twisted.internet import defer, reactor
 from twisted.internet.address import IPv4Address, IPv6Address
 from twisted.internet.defer import (
     CancelledError,
+    Deferred,
     inlineCallbacks,
     maybeDeferred,
     returnValue,
@@ -27,6 +29,7 @@ from twisted.internet.defer import (
 from twisted.internet.endpoints import TCP6ServerEndpoint
 from twisted.internet.error import ConnectionClosed
 from twisted.internet.protocol import Factory
+from twisted.internet.task import LoopingCall
 from twisted.internet.threads import deferToThread
 from twisted.protocols import amp
 from zope.interface import implementer
@@ -62,7 +65,7 @@ from provisioningserver.prometheus.metrics import (
 )
 from provisioningserver.rpc import cluster, common, exceptions, region
 from provisioningserver.rpc.common import RPCProtocol
-from provisioningserver.rpc.exceptions import NoSuchCluster
+from provisioningserver.rpc.exceptions import NoSuchCluster, NoSuchNode
 from provisioningserver.rpc.interfaces import IConnection
 from provisioningserver.security import calculate_digest
 from provisioningserver.utils.events import EventGroup
@@ -78,6 +81,95 @@ from provisioningserver.utils.version import get_maas_version
 log = LegacyLogger()
 
 
+class PowerStateWriter:
+    """Write power states reported by rack controllers in batches.
+
+    Rack controllers report the power state of each node they query
+    separately. Rather than taking a thread from the database pool for each
+    report, reports are queued and written every `interval` seconds, with
+    at most one write in progress at any time.
+    """
+
+    def __init__(self, interval=0.1, clock=reactor):
+        self.interval = interval
+        self.pending = {}
+        self.waiters = defaultdict(list)
+        self.writing = LoopingCall(self.process)
+        self.writing.clock = clock
+        self.writingDefer = None
+
+    def update(self, system_id, power_state):
+        """Queue an update of the power state of `system_id`.
+
+        :return: A `Deferred` that fires once the power state has been
+            written, or fails with `NoSuchNode` if the node doesn't exist.
+        """
+        d = Deferred()
+        self.pending[system_id] = power_state
+        self.waiters[system_id].append(d)
+        if not self.writing.running:
+            self.writingDefer = self.writing.start(self.interval, now=False)
+        return d
+
+    def process(self):
+        """Write pending power states, or stop if there are none."""
+        if len(self.pending) == 0:
+            # Nothing more to do.
+            self.writing.stop()
+            self.writingDefer = None
+        else:
+            return self.flush()
+
+    def stop(self):
+        """Stop writing periodically, then write all pending power states.
+
+        This waits for any write already in progress before writing what
+        remains, so there is still at most one write at a time.
+        """
+        if self.writing.running:
+            self.writing.stop()
+        d, self.writingDefer = self.writingDefer, None
+        if d is None:
+            d = succeed(None)
+        d.addErrback(log.err, "Failure writing power states.")
+        d.addCallback(lambda _: self.flush())
+        return d
+
+    def flush(self):
+        """Write all pending power states now."""
+        power_states, self.pending = self.pending, {}
+        waiters, self.waiters = self.waiters, defaultdict(list)
+        if len(power_states) == 0:
+            return succeed(None)
+        d = deferToDatabase(nodes.update_node_power_states, power_states)
+        d.addCallbacks(
+            partial(self._notify, waiters), partial(self._fail, waiters)
+        )
+        return d
+
+    def _notify(self, waiters, result):
+        updated, failures = result
+        updated = set(updated)
+        for system_id, ds in waiters.items():
+            for d in ds:
+                if system_id in updated:
+                    d.callback(None)
+                elif system_id in failures:
+                    d.errback(failures[system_id])
+                else:
+                    d.errback(NoSuchNode.from_system_id(system_id))
+
+    def _fail(self, waiters, failure):
+        for ds in waiters.values():
+            for d in ds:
+                d.errback(failure)
+
+
+# Shared by all connections so that power state reports from all rack
+# controllers connected to this process are written together.
+powerStateWriter = PowerStateWriter()
+
+
 class Region(RPCProtocol):
     """The RPC protocol supported by a region controller.
 
@@ -292,9 +384,7 @@ class Region(RPCProtocol):
         Implementation of
         :py:class:`~provisioningserver.rpc.region.UpdateNodePowerState`.
         """
-        d = deferToDatabase(
-            nodes.update_node_power_state, system_id, power_state
-        )
+        d = powerStateWriter.update(system_id, power_state)
         d.addCallback(lambda args: {})
         return d
 
@@ -1076,6 +1166,8 @@ class RegionService(service.Service, object):
                     yield conn.transport.loseConnection()
                 except Exception:
                     log.err(None, "Failure when closing RPC connection.")
+        # Don't lose power states that have been reported but not written.
+        yield powerStateWriter.stop()
         yield super().stopService()
 
     @asynchronous(timeout=FOREVER)
@@ -1170,6 +1262,20 @@ class RegionService(service.Service, object):
 
         return d.addCallbacks(cb_client, cancelled)
 
+    @asynchronous(timeout=FOREVER)
+    def getAllClientsFromIdentifiers(self, identifiers):
+        """Return a list with a client for every connection to any of the
+        specified `identifiers`.
+
+        Unlike `getClientFromIdentifiers` this does not wait for a
+        connection; the list is empty if there are none.
+        """
+        return [
+            RackClient(connection, self.connectionsCache[connection])
+            for ident in identifiers
+            for connection in self.connections.get(ident, ())
+        ]
+
     @asynchronous(timeout=FOREVER)
     def getAllClients(self):
         """Return a list with one connection per rack controller."""
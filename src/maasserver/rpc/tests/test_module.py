@@ -10,11 +10,14 @@ from unittest.mock import sentinel
 from crochet import wait_for
 from testtools.deferredruntest import assert_fails_with
 from testtools.matchers import Equals, Is
+from twisted.internet import defer
+from twisted.internet.task import Clock
 
 from maasserver import eventloop, rpc
 from maastesting.matchers import MockCalledOnceWith
 from maastesting.testcase import MAASTestCase
 from provisioningserver.rpc import exceptions
+from provisioningserver.utils.events import EventGroup
 
 wait_for_reactor = wait_for(30)  # 30 seconds.
 
@@ -45,3 +48,74 @@ class TestFunctions(MAASTestCase):
         getAllClients.return_value = sentinel.clients
         self.assertThat(getAllClients(), Is(sentinel.clients))
         self.assertThat(getAllClients, MockCalledOnceWith())
+
+
+class TestGetClientFromIdentifiersCache(MAASTestCase):
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(rpc._client_cache.clear)
+        getServiceNamed = self.patch(eventloop.services, "getServiceNamed")
+        self.service = getServiceNamed.return_value
+        self.service.events = EventGroup("connected", "disconnected")
+        self.getClient = self.service.getClientFromIdentifiers
+        self.getClient.side_effect = lambda *args, **kwargs: defer.succeed(
+            sentinel.client
+        )
+        self.getAllClients = self.service.getAllClientsFromIdentifiers
+        self.getAllClients.return_value = [sentinel.client]
+        self.clock = Clock()
+
+    @wait_for_reactor
+    @defer.inlineCallbacks
+    def test_caches_client_for_identifiers(self):
+        client1 = yield rpc.getClientFromIdentifiers(
+            ["a", "b"], clock=self.clock
+        )
+        client2 = yield rpc.getClientFromIdentifiers(
+            ["b", "a"], clock=self.clock
+        )
+        self.assertThat(client1, Is(sentinel.client))
+        self.assertThat(client2, Is(sentinel.client))
+        self.assertThat(
+            self.getClient, MockCalledOnceWith(["a", "b"], timeout=0)
+        )
+
+    @wait_for_reactor
+    @defer.inlineCallbacks
+    def test_picks_cached_client_at_random(self):
+        self.getAllClients.return_value = [sentinel.client1, sentinel.client2]
+        random = self.patch(rpc, "random")
+        random.choice.return_value = sentinel.client2
+        yield rpc.getClientFromIdentifiers(["a", "b"], clock=self.clock)
+        client = yield rpc.getClientFromIdentifiers(
+            ["a", "b"], clock=self.clock
+        )
+        self.assertThat(client, Is(sentinel.client2))
+        self.assertThat(
+            random.choice,
+            MockCalledOnceWith([sentinel.client1, sentinel.client2]),
+        )
+
+    @wait_for_reactor
+    @defer.inlineCallbacks
+    def test_does_not_cache_without_connections(self):
+        self.getAllClients.return_value = []
+        yield rpc.getClientFromIdentifiers(["a"], clock=self.clock)
+        yield rpc.getClientFromIdentifiers(["a"], clock=self.clock)
+        self.assertThat(self.getClient.call_count, Equals(2))
+
+    @wait_for_reactor
+    @defer.inlineCallbacks
+    def test_cached_client_expires(self):
+        yield rpc.getClientFromIdentifiers(["a"], clock=self.clock)
+        self.clock.advance(rpc.CLIENT_CACHE_TTL)
+        yield rpc.getClientFromIdentifiers(["a"], clock=self.clock)
+        self.assertThat(self.getClient.call_count, Equals(2))
+
+    @wait_for_reactor
+    @defer.inlineCallbacks
+    def test_cached_client_discarded_on_disconnect(self):
+        yield rpc.getClientFromIdentifiers(["a", "b"], clock=self.clock)
+        self.service.events.disconnected.fire("b")
+        yield rpc.getClientFromIdentifiers(["a", "b"], clock=self.clock)
+        self.assertThat(self.getClient.call_count, Equals(2))
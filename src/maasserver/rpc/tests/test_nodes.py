@@ -36,6 +36,7 @@ from maasserver.rpc.nodes import (
     mark_node_failed,
     request_node_info_by_mac_address,
     update_node_power_state,
+    update_node_power_states,
 )
 from maasserver.rpc.testing.fixtures import MockLiveRegionToClusterRPCFixture
 from maasserver.testing.architecture import make_usable_architecture
@@ -49,6 +50,7 @@ from maasserver.testing.testcase import (
     MAASTransactionServerTestCase,
 )
 from maasserver.utils.orm import post_commit_hooks, reload_object
+from maastesting.matchers import MockCalledOnceWith
 from maastesting.twisted import always_succeed_with
 from metadataserver.builtin_scripts import load_builtin_scripts
 from provisioningserver.drivers.power.registry import PowerDriverRegistry
@@ -552,6 +554,87 @@ class TestUpdateNodePowerState(MAASServerTestCase):
         self.assertEqual(reload_object(node).power_state, POWER_STATE.ON)
 
 
+class TestUpdateNodePowerStates(MAASServerTestCase):
+    def test_ignores_nodes_that_dont_exist(self):
+        self.assertEqual(
+            ([], {}),
+            update_node_power_states(
+                {factory.make_name("system_id"): POWER_STATE.ON}
+            ),
+        )
+
+    def test_updates_node_power_states(self):
+        on_node = factory.make_Node(power_state=POWER_STATE.OFF)
+        off_node = factory.make_Node(power_state=POWER_STATE.ON)
+        updated, failures = update_node_power_states(
+            {
+                on_node.system_id: POWER_STATE.ON,
+                off_node.system_id: POWER_STATE.OFF,
+            }
+        )
+        self.assertItemsEqual([on_node.system_id, off_node.system_id], updated)
+        self.assertEqual({}, failures)
+        self.assertEqual(reload_object(on_node).power_state, POWER_STATE.ON)
+        self.assertEqual(reload_object(off_node).power_state, POWER_STATE.OFF)
+
+    def test_updates_unchanged_nodes_in_one_query(self):
+        nodes = [
+            factory.make_Node(power_state=POWER_STATE.ON) for _ in range(3)
+        ]
+        power_states = {node.system_id: POWER_STATE.ON for node in nodes}
+        power_state_updated = now() - timedelta(minutes=5)
+        Node.objects.update(power_state_updated=power_state_updated)
+        # One query to read current states, one to update them all.
+        with self.assertNumQueries(2):
+            update_node_power_states(power_states)
+        for node in nodes:
+            self.assertThat(
+                reload_object(node).power_state_updated,
+                GreaterThan(power_state_updated),
+            )
+
+    def test_failure_for_one_node_does_not_affect_the_others(self):
+        unchanged_node = factory.make_Node(power_state=POWER_STATE.ON)
+        failing_node = factory.make_Node(power_state=POWER_STATE.OFF)
+        changed_node = factory.make_Node(power_state=POWER_STATE.OFF)
+        update_power_state = Node.update_power_state
+
+        def fail_for_one_node(node, power_state):
+            if node.system_id == failing_node.system_id:
+                raise ZeroDivisionError()
+            return update_power_state(node, power_state)
+
+        self.patch(Node, "update_power_state", fail_for_one_node)
+        updated, failures = update_node_power_states(
+            {
+                unchanged_node.system_id: POWER_STATE.ON,
+                failing_node.system_id: POWER_STATE.ON,
+                changed_node.system_id: POWER_STATE.ON,
+            }
+        )
+        self.assertItemsEqual(
+            [unchanged_node.system_id, changed_node.system_id], updated
+        )
+        self.assertEqual([failing_node.system_id], list(failures))
+        self.assertIsInstance(
+            failures[failing_node.system_id].value, ZeroDivisionError
+        )
+        self.assertEqual(
+            reload_object(changed_node).power_state, POWER_STATE.ON
+        )
+        self.assertEqual(
+            reload_object(failing_node).power_state, POWER_STATE.OFF
+        )
+
+    def test_finalizes_release_of_releasing_node(self):
+        node = factory.make_Node(
+            status=NODE_STATUS.RELEASING, power_state=POWER_STATE.OFF
+        )
+        mock_finalize_release = self.patch(Node, "_finalize_release")
+        update_node_power_states({node.system_id: POWER_STATE.OFF})
+        self.assertThat(mock_finalize_release, MockCalledOnceWith())
+
+
 class TestGetControllerType(MAASServerTestCase):
     """Tests for `get_controller_type`."""
 
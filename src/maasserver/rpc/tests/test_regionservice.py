@@ -43,6 +43,7 @@ from twisted.internet.endpoints import TCP4ServerEndpoint
 from twisted.internet.error import ConnectionClosed
 from twisted.internet.interfaces import IStreamServerEndpoint
 from twisted.internet.protocol import Factory
+from twisted.internet.task import Clock
 from twisted.protocols import amp
 from twisted.python.failure import Failure
 from twisted.python.reflect import fullyQualifiedName
@@ -51,6 +52,7 @@ from zope.interface.verify import verifyObject
 from maasserver.models import RackController, RegionController
 from maasserver.rpc import regionservice
 from maasserver.rpc.regionservice import (
+    PowerStateWriter,
     RackClient,
     Region,
     RegionServer,
@@ -75,6 +77,7 @@ from provisioningserver.rpc import cluster, exceptions
 from provisioningserver.rpc.exceptions import (
     CannotRegisterRackController,
     NoConnectionsAvailable,
+    NoSuchNode,
 )
 from provisioningserver.rpc.interfaces import IConnection
 from provisioningserver.rpc.region import RegisterRackController
@@ -636,6 +639,94 @@ class TestRackClient(MAASTestCase):
         )
 
 
+class TestPowerStateWriter(MAASTestCase):
+    def setUp(self):
+        super().setUp()
+        self.deferToDatabase = self.patch(regionservice, "deferToDatabase")
+        self.deferToDatabase.side_effect = lambda func, power_states: succeed(
+            (list(power_states), {})
+        )
+
+    def test_writes_updates_together_after_interval(self):
+        clock = Clock()
+        writer = PowerStateWriter(clock=clock)
+        d1 = writer.update("abc", "on")
+        d2 = writer.update("def", "off")
+        self.assertThat(self.deferToDatabase.call_count, Equals(0))
+        clock.advance(writer.interval)
+        self.assertThat(
+            self.deferToDatabase,
+            MockCalledOnceWith(
+                regionservice.nodes.update_node_power_states,
+                {"abc": "on", "def": "off"},
+            ),
+        )
+        self.assertIsNone(extract_result(d1))
+        self.assertIsNone(extract_result(d2))
+
+    def test_stops_when_nothing_is_pending(self):
+        clock = Clock()
+        writer = PowerStateWriter(clock=clock)
+        writer.update("abc", "on")
+        clock.advance(writer.interval)
+        clock.advance(writer.interval)
+        self.assertFalse(writer.writing.running)
+        self.assertIsNone(writer.writingDefer)
+
+    def test_fails_with_NoSuchNode_for_unknown_nodes(self):
+        self.deferToDatabase.side_effect = None
+        self.deferToDatabase.return_value = succeed(([], {}))
+        clock = Clock()
+        writer = PowerStateWriter(clock=clock)
+        d = writer.update("abc", "on")
+        clock.advance(writer.interval)
+        self.assertRaises(NoSuchNode, extract_result, d)
+
+    def test_fails_only_the_nodes_that_failed(self):
+        failure = Failure(ZeroDivisionError())
+        self.deferToDatabase.side_effect = None
+        self.deferToDatabase.return_value = succeed(
+            (["abc"], {"def": failure})
+        )
+        clock = Clock()
+        writer = PowerStateWriter(clock=clock)
+        d1 = writer.update("abc", "on")
+        d2 = writer.update("def", "off")
+        clock.advance(writer.interval)
+        self.assertIsNone(extract_result(d1))
+        self.assertRaises(ZeroDivisionError, extract_result, d2)
+
+    def test_flush_writes_immediately(self):
+        writer = PowerStateWriter(clock=Clock())
+        d = writer.update("abc", "on")
+        writer.flush()
+        self.assertIsNone(extract_result(d))
+        self.assertEqual({}, writer.pending)
+
+    def test_stop_waits_for_write_in_progress_then_flushes(self):
+        writing = Deferred()
+        self.deferToDatabase.side_effect = [writing, succeed((["def"], {}))]
+        clock = Clock()
+        writer = PowerStateWriter(clock=clock)
+        d1 = writer.update("abc", "on")
+        clock.advance(writer.interval)
+        d2 = writer.update("def", "off")
+        stopped = writer.stop()
+        self.assertFalse(writer.writing.running)
+        self.assertThat(self.deferToDatabase.call_count, Equals(1))
+        self.assertFalse(stopped.called)
+        writing.callback((["abc"], {}))
+        self.assertThat(self.deferToDatabase.call_count, Equals(2))
+        self.assertIsNone(extract_result(stopped))
+        self.assertIsNone(extract_result(d1))
+        self.assertIsNone(extract_result(d2))
+
+    def test_stop_flushes_when_idle(self):
+        writer = PowerStateWriter(clock=Clock())
+        self.assertIsNone(extract_result(writer.stop()))
+        self.assertThat(self.deferToDatabase.call_count, Equals(0))
+
+
 class TestRegionService(MAASTestCase):
     def test_init_sets_appropriate_instance_attributes(self):
         service = RegionService(sentinel.ipcWorker)
@@ -980,6 +1071,31 @@ class TestRegionService(MAASTestCase):
         with ExpectedException(NoConnectionsAvailable):
             service.getRandomClient()
 
+    @wait_for_reactor
+    def test_getAllClientsFromIdentifiers(self):
+        service = RegionService(sentinel.ipcWorker)
+        uuid1 = factory.make_UUID()
+        c1 = DummyConnection()
+        c2 = DummyConnection()
+        service.connections[uuid1].update({c1, c2})
+        uuid2 = factory.make_UUID()
+        c3 = DummyConnection()
+        service.connections[uuid2].add(c3)
+        uuid3 = factory.make_UUID()
+        c4 = DummyConnection()
+        service.connections[uuid3].add(c4)
+        clients = service.getAllClientsFromIdentifiers(
+            [uuid1, uuid2, factory.make_UUID()]
+        )
+        self.assertThat(
+            clients,
+            MatchesSetwise(
+                Equals(RackClient(c1, {})),
+                Equals(RackClient(c2, {})),
+                Equals(RackClient(c3, {})),
+            ),
+        )
+
     @wait_for_reactor
     def test_getAllClients(self):
         service = RegionService(sentinel.ipcWorker)
@@ -510,6 +510,19 @@ class TestCIDRField(MAASLegacyServerTestCase):
         instance = CIDRTestModel.objects.create(cidr=cidr)
         self.assertEqual(normalized_cidr, reload_object(instance).cidr)
 
+    def test_net_contains_matches_enclosing_cidrs(self):
+        network8 = CIDRTestModel.objects.create(cidr="10.0.0.0/8")
+        network24 = CIDRTestModel.objects.create(cidr="10.0.0.0/24")
+        CIDRTestModel.objects.create(cidr="192.0.2.0/24")
+        self.assertItemsEqual(
+            [network8, network24],
+            CIDRTestModel.objects.filter(cidr__net_contains="10.0.0.1"),
+        )
+        self.assertItemsEqual(
+            [network8],
+            CIDRTestModel.objects.filter(cidr__net_contains="10.0.0.0/24"),
+        )
+
 
 class TestIPv4CIDRField(MAASLegacyServerTestCase):
 
@@ -18,7 +18,10 @@ from provisioningserver.rpc.exceptions import (
     NoConnectionsAvailable,
     NoSuchCluster,
 )
-from provisioningserver.rpc.power import query_all_nodes
+from provisioningserver.rpc.power import (
+    MAX_POWER_QUERY_CONCURRENCY,
+    query_all_nodes,
+)
 from provisioningserver.rpc.region import ListNodePowerParameters
 
 maaslog = get_maas_logger("power_monitor_service")
@@ -29,7 +32,7 @@ class NodePowerMonitorService(TimerService, object):
     """Service to monitor the power status of all nodes in this cluster."""
 
     check_interval = timedelta(seconds=15).total_seconds()
-    max_nodes_at_once = 5
+    max_nodes_at_once = MAX_POWER_QUERY_CONCURRENCY
 
     def __init__(self, clock=None):
         # Call self.query_nodes() every self.check_interval.
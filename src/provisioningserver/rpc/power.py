@@ -50,6 +50,10 @@ log = LegacyLogger()
 # meant to cope with broken BMCs.
 CHANGE_POWER_STATE_TIMEOUT = timedelta(minutes=5).total_seconds()
 
+# The maximum number of nodes whose power state is queried at once, so that
+# a large number of nodes doesn't spawn a process for each of them.
+MAX_POWER_QUERY_CONCURRENCY = 5
+
 # We could use a Registry here, but it seems kind of like overkill.
 power_action_registry = {}
 
@@ -484,7 +488,9 @@ def query_node(node, clock):
         return d
 
 
-def query_all_nodes(nodes, max_concurrency=5, clock=reactor):
+def query_all_nodes(
+    nodes, max_concurrency=MAX_POWER_QUERY_CONCURRENCY, clock=reactor
+):
     """Queries the given nodes for their power state.
 
     Nodes' states are reported back to the region.
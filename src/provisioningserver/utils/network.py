@@ -19,6 +19,7 @@ __all__ = [
     "ip_range_within_network",
 ]
 
+from bisect import bisect_right
 import codecs
 from collections import namedtuple
 from operator import attrgetter
@@ -413,6 +414,18 @@ class MAASIPSet(set):
         self.ranges = _normalize_ipranges(self.ranges)
         self.ranges = _combine_overlapping_maasipranges(self.ranges)
         self.ranges = _coalesce_adjacent_purposes(self.ranges)
+        # Ranges of a single address family are sorted by their first
+        # address, which allows addresses to be found with a binary search.
+        # The bounds are kept as plain lists of integers alongside the
+        # ranges, so a search doesn't touch the `IPRange` objects until a
+        # match is found.
+        firsts = [item.first for item in self.ranges]
+        if all(a < b for a, b in zip(firsts, firsts[1:])):
+            self._firsts = firsts
+            self._lasts = [item.last for item in self.ranges]
+        else:
+            self._firsts = None
+            self._lasts = None
 
     def __ior__(self, other):
         """Return self |= other."""
@@ -440,6 +453,11 @@ class MAASIPSet(set):
         else:
             addr = IPAddress(search)
             addr = int(addr)
+            if self._firsts is not None:
+                index = bisect_right(self._firsts, addr) - 1
+                if index >= 0 and addr <= self._lasts[index]:
+                    return self.ranges[index]
+                return None
             for item in self.ranges:
                 if item.first <= addr <= item.last:
                     return item
@@ -524,6 +542,28 @@ class MAASIPSet(set):
             return None
         return largest
 
+    def get_smallest_unused_block(self) -> Optional[MAASIPRange]:
+        """Find the smallest unused block of addresses in this set.
+
+        If several unused blocks have the same size, the lowest one is
+        returned (the ranges in this set are sorted, so this is the first
+        one found).
+
+        :returns: a `MAASIPRange` if an unused block was found, or None if
+            no IP addresses are unused.
+        """
+        smallest = None
+        smallest_size = None
+        for item in self.ranges:
+            if IPRANGE_TYPE.UNUSED in item.purpose:
+                size = item.last - item.first + 1
+                if smallest_size is None or size < smallest_size:
+                    smallest, smallest_size = item, size
+                    if size == 1:
+                        # Nothing can be smaller than a single address.
+                        break
+        return smallest
+
     def render_json(self, *args, **kwargs):
         return [
             iprange.render_json(*args, **kwargs) for iprange in self.ranges
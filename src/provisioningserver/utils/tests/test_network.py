@@ -78,6 +78,7 @@ from provisioningserver.utils.network import (
     interface_children,
     intersect_iprange,
     ip_range_within_network,
+    IPRANGE_TYPE,
     IPRangeStatistics,
     is_loopback_address,
     LOOPBACK_INTERFACE_INFO,
@@ -912,6 +913,103 @@ class TestMAASIPSet(MAASTestCase):
         self.assertThat(str(IPAddress(s1.first)), Equals("10.0.0.1"))
         self.assertThat(str(IPAddress(s1.last)), Equals("10.0.0.8"))
 
+    def test_find_returns_range_containing_address(self):
+        s = MAASIPSet(
+            [
+                make_iprange(
+                    "10.0.0.%d" % (i * 10), "10.0.0.%d" % (i * 10 + 5)
+                )
+                for i in range(1, 20)
+            ]
+        )
+        self.assertThat(
+            s.find("10.0.0.73"),
+            Equals(make_iprange("10.0.0.70", "10.0.0.75")),
+        )
+        self.assertThat(
+            s.find("10.0.0.10"),
+            Equals(make_iprange("10.0.0.10", "10.0.0.15")),
+        )
+        self.assertThat(
+            s.find("10.0.0.195"),
+            Equals(make_iprange("10.0.0.190", "10.0.0.195")),
+        )
+        self.assertThat(s.find("10.0.0.9"), Is(None))
+        self.assertThat(s.find("10.0.0.76"), Is(None))
+        self.assertThat(s.find("10.0.0.196"), Is(None))
+
+    def test_find_with_mixed_address_families(self):
+        s = MAASIPSet(
+            [
+                make_iprange("10.0.0.1", "10.0.0.100"),
+                make_iprange("2001:db8::1", "2001:db8::100"),
+            ]
+        )
+        self.assertThat(
+            s.find("10.0.0.50"),
+            Equals(make_iprange("10.0.0.1", "10.0.0.100")),
+        )
+        self.assertThat(
+            s.find("2001:db8::50"),
+            Equals(make_iprange("2001:db8::1", "2001:db8::100")),
+        )
+        self.assertThat(s.find("10.0.0.101"), Is(None))
+
+    def test_find_after_ior(self):
+        s = MAASIPSet([make_iprange("10.0.0.1", "10.0.0.10")])
+        s |= MAASIPSet([make_iprange("10.0.0.50", "10.0.0.60")])
+        self.assertThat(
+            s.find("10.0.0.55"),
+            Equals(make_iprange("10.0.0.50", "10.0.0.60")),
+        )
+
+    def test_get_smallest_unused_block_returns_smallest_range(self):
+        s = MAASIPSet(
+            [
+                make_iprange("10.0.0.1", "10.0.0.199"),
+                make_iprange("10.0.0.204", "10.0.0.209"),
+                make_iprange("10.0.0.213", "10.0.0.254"),
+            ]
+        )
+        self.assertThat(
+            s.get_unused_ranges("10.0.0.0/24").get_smallest_unused_block(),
+            Equals(make_iprange("10.0.0.210", "10.0.0.212")),
+        )
+
+    def test_get_smallest_unused_block_prefers_lowest_range(self):
+        s = MAASIPSet(
+            [
+                make_iprange("10.0.0.1", "10.0.0.199"),
+                make_iprange("10.0.0.202", "10.0.0.209"),
+                make_iprange("10.0.0.212", "10.0.0.254"),
+            ]
+        )
+        self.assertThat(
+            s.get_unused_ranges("10.0.0.0/24").get_smallest_unused_block(),
+            Equals(make_iprange("10.0.0.200", "10.0.0.201")),
+        )
+
+    def test_get_smallest_unused_block_ignores_used_ranges(self):
+        s = MAASIPSet(
+            [
+                make_iprange("10.0.0.1", purpose="dns-server"),
+                make_iprange(
+                    "10.0.0.200", "10.0.0.201", purpose=IPRANGE_TYPE.UNUSED
+                ),
+            ]
+        )
+        self.assertThat(
+            s.get_smallest_unused_block(),
+            Equals(make_iprange("10.0.0.200", "10.0.0.201")),
+        )
+
+    def test_get_smallest_unused_block_returns_none_if_all_used(self):
+        s = MAASIPSet([make_iprange("10.0.0.1", "10.0.0.254")])
+        self.assertThat(
+            s.get_unused_ranges("10.0.0.0/24").get_smallest_unused_block(),
+            Is(None),
+        )
+
 
 class TestIPRangeStatistics(MAASTestCase):
     def test_statistics_are_accurate(self):